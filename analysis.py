@@ -1,8 +1,17 @@
 import pandas as pd
 import yfinance as yf
-import google.generativeai as genai
 import os
+import re
+import time
+import functools
+import threading
+from datetime import date
+from dataclasses import dataclass
+import warnings
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from cache import FileCache, make_key
+from yfinance.exceptions import YFRateLimitError
 
 # A list of top 30 tech stocks (US-based)
 TECH_STOCKS = [
@@ -12,18 +21,115 @@ TECH_STOCKS = [
     'ADP', 'KLAC', 'SNPS'
 ]
 
+# Sorted once at import, the UI lists it on every rerun
+SORTED_TECH_STOCKS = tuple(sorted(set(TECH_STOCKS)))
+
+# Price/info data changes daily, financial statements only change quarterly
+INFO_TTL = 24 * 3600
+STATEMENT_TTL = 7 * 24 * 3600
+
+_cache = FileCache(ttl_seconds=INFO_TTL)
+
+
+# Seconds to wait on a Yahoo Finance response, where yfinance accepts a timeout
+REQUEST_TIMEOUT = 10
+
+# Caps the statement requests in flight across all threads; get_all_fundamental_data's
+# workers each fan out to four endpoints, which would otherwise invite Yahoo's 429s
+MAX_CONCURRENT_REQUESTS = 8
+_request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+# The only info keys and statement rows the analysis reads; everything else is dropped before caching
+INFO_KEYS = ('longName', 'currentPrice', 'previousClose', 'marketCap', 'trailingPE', 'priceToBook', 'sharesOutstanding')
+BALANCE_SHEET_ROWS = ('Total Liabilities Net Minority Interest', 'Stockholders Equity', 'Current Assets', 'Current Liabilities')
+FINANCIALS_ROWS = ('Net Income',)
+CASHFLOW_ROWS = ('Free Cash Flow', 'Total Cash From Operating Activities', 'Capital Expenditures')
+
 # --- Fundamental Analysis ---
 
+@dataclass(slots=True)
+class Fundamentals:
+    """
+    The fundamental data of a single stock ticker.
+    """
+    ticker: str
+    company_name: str
+    current_price: float
+    market_cap: float
+    pe_ratio: float | None
+    pb_ratio: float | None
+    debt_to_equity: float
+    current_ratio: float
+    return_on_equity: float
+    free_cash_flow: float
+    intrinsic_value: float
+    fundamental_status: str
+    dcf_details: str
+
+def _select_keys(info, keys):
+    """
+    Keeps only the given keys of an info dict (those that are present).
+    """
+    return {key: info[key] for key in keys if key in info}
+
+def _select_rows(statement, rows):
+    """
+    Keeps only the given rows of a financial statement (those that are present).
+    """
+    return statement.loc[statement.index.intersection(rows)]
+
+def _is_retryable(error):
+    """
+    True for errors that may go away on retry: Yahoo rate limiting, timeouts and connection failures.
+    """
+    if isinstance(error, YFRateLimitError):
+        return True
+    if not isinstance(error, OSError):
+        return False
+    # The HTTP clients' request exceptions derive from OSError. Timeouts and connection
+    # failures carry no response; of the HTTP error statuses only 429 is transient.
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status is None or status == 429
+
+def _limited(fetch):
+    """
+    Wraps a Yahoo Finance fetch so it waits for one of the shared request slots.
+    """
+    def _fetch():
+        with _request_slots:
+            return fetch()
+    return _fetch
+
+def get_all_statements(ticker):
+    """
+    Fetches the info dict, balance sheet, financials and cash flow statement of a ticker.
+    The four Yahoo Finance endpoints are requested concurrently (through the disk cache),
+    so the latency is that of the slowest endpoint rather than the sum of all four.
+    """
+    stock = yf.Ticker(ticker)
+    endpoints = [
+        ('info', lambda: _select_keys(stock.info, INFO_KEYS), INFO_TTL),
+        ('balance_sheet', lambda: _select_rows(stock.balance_sheet, BALANCE_SHEET_ROWS), STATEMENT_TTL),
+        ('financials', lambda: _select_rows(stock.financials, FINANCIALS_ROWS), STATEMENT_TTL),
+        ('cashflow', lambda: _select_rows(stock.cashflow, CASHFLOW_ROWS), STATEMENT_TTL),
+    ]
+    with ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+        futures = [
+            executor.submit(_cache.get_or_compute, make_key(ticker, endpoint), _limited(fetch), ttl)
+            for endpoint, fetch, ttl in endpoints
+        ]
+    return tuple(future.result() for future in futures)
+
 def get_fundamental_data(ticker):
     """
     Fetches and calculates all required fundamental data for a single stock ticker.
     """
-    stock = yf.Ticker(ticker)
-    info = stock.info
-    balance_sheet = stock.balance_sheet
-    financials = stock.financials
-    cashflow = stock.cashflow
+    return build_fundamental_data(ticker, *get_all_statements(ticker))
 
+def build_fundamental_data(ticker, info, balance_sheet, financials, cashflow):
+    """
+    Calculates the fundamental data of a ticker from its already fetched statements.
+    """
     # Basic info
     market_cap = info.get('marketCap', 0)
     current_price = info.get('currentPrice', info.get('previousClose', 0))
@@ -32,49 +138,76 @@ def get_fundamental_data(ticker):
     pe_ratio = info.get('trailingPE')
     pb_ratio = info.get('priceToBook')
 
+    # Latest reported value of every line item, so each lookup below is a plain dict access
+    bs = balance_sheet.iloc[:, 0].to_dict() if not balance_sheet.empty else {}
+    fin = financials.iloc[:, 0].to_dict() if not financials.empty else {}
+    cf = cashflow.iloc[:, 0].to_dict() if not cashflow.empty else {}
+
     # Metrics from balance sheet
-    total_debt = balance_sheet.loc['Total Liab'].iloc[0] if 'Total Liab' in balance_sheet.index else 0
-    total_equity = balance_sheet.loc['Total Stockholder Equity'].iloc[0] if 'Total Stockholder Equity' in balance_sheet.index else 1
+    total_debt = bs.get('Total Liabilities Net Minority Interest', 0)
+    total_equity = bs.get('Stockholders Equity', 1)
     debt_to_equity = total_debt / total_equity if total_equity else 0
 
-    current_assets = balance_sheet.loc['Total Current Assets'].iloc[0] if 'Total Current Assets' in balance_sheet.index else 0
-    current_liabilities = balance_sheet.loc['Total Current Liabilities'].iloc[0] if 'Total Current Liabilities' in balance_sheet.index else 1
+    current_assets = bs.get('Current Assets', 0)
+    current_liabilities = bs.get('Current Liabilities', 1)
     current_ratio = current_assets / current_liabilities if current_liabilities else 0
 
     # Metrics from financials
-    net_income = financials.loc['Net Income'].iloc[0] if 'Net Income' in financials.index else 0
+    net_income = fin.get('Net Income', 0)
     roe = net_income / total_equity if total_equity else 0
 
     # Free Cash Flow
-    free_cash_flow = cashflow.loc['Total Cash From Operating Activities'].iloc[0] - cashflow.loc['Capital Expenditures'].iloc[0] if 'Total Cash From Operating Activities' in cashflow.index and 'Capital Expenditures' in cashflow.index else 0
+    free_cash_flow = cf['Total Cash From Operating Activities'] - cf['Capital Expenditures'] if 'Total Cash From Operating Activities' in cf and 'Capital Expenditures' in cf else 0
 
     # DCF Calculation
-    intrinsic_value, dcf_details = calculate_dcf(stock)
+    intrinsic_value, dcf_details = calculate_dcf(cashflow, info.get('sharesOutstanding', 0))
 
     # Fundamental Status
     fundamental_status = get_fundamental_status(intrinsic_value, current_price)
 
-    return {
-        'Ticker': ticker,
-        'Company Name': info.get('longName', 'N/A'),
-        'Current Price': current_price,
-        'Market Cap': market_cap,
-        'P/E Ratio': pe_ratio,
-        'P/B Ratio': pb_ratio,
-        'Debt-to-Equity': debt_to_equity,
-        'Current Ratio': current_ratio,
-        'Return on Equity': roe,
-        'Free Cash Flow': free_cash_flow,
-        'Intrinsic Value (DCF)': intrinsic_value,
-        'Fundamental Status': fundamental_status,
-        'DCF Details': dcf_details
-    }
-
-def calculate_dcf(stock, discount_rate=0.085, perpetual_growth_rate=0.025, projection_years=5):
-    """
-    Performs a simplified 2-stage Discounted Cash Flow (DCF) analysis.
-    """
-    cashflow_statement = stock.cashflow
+    return Fundamentals(
+        ticker=ticker,
+        company_name=info.get('longName', 'N/A'),
+        current_price=current_price,
+        market_cap=market_cap,
+        pe_ratio=pe_ratio,
+        pb_ratio=pb_ratio,
+        debt_to_equity=debt_to_equity,
+        current_ratio=current_ratio,
+        return_on_equity=roe,
+        free_cash_flow=free_cash_flow,
+        intrinsic_value=intrinsic_value,
+        fundamental_status=fundamental_status,
+        dcf_details=dcf_details
+    )
+
+def dcf_value_per_share(last_fcf, growth_rate, discount_rate, perpetual_growth_rate, projection_years, shares_outstanding):
+    """
+    The 2-stage DCF arithmetic behind calculate_dcf. Every argument except projection_years
+    may be a scalar or a NumPy array, so whole grids of tickers or rates (e.g. a sensitivity
+    sweep over discount and growth rates) are valued in one broadcast pass.
+    """
+    years = np.arange(1, projection_years + 1)
+    growth_rate = np.asarray(growth_rate, dtype=np.float64)
+    discount_rate = np.asarray(discount_rate, dtype=np.float64)
+
+    # Project future FCF and discount it to present value
+    future_fcf = np.asarray(last_fcf, dtype=np.float64)[..., np.newaxis] * (1 + growth_rate[..., np.newaxis])**years
+    discount_factors = (1 + discount_rate[..., np.newaxis])**years
+    discounted_fcf = future_fcf / discount_factors
+
+    # Terminal value, discounted back from the last projection year
+    terminal_value = (future_fcf[..., -1] * (1 + perpetual_growth_rate)) / (discount_rate - perpetual_growth_rate)
+    discounted_terminal_value = terminal_value / discount_factors[..., -1]
+
+    total_intrinsic_value = discounted_fcf.sum(axis=-1) + discounted_terminal_value
+    return total_intrinsic_value / shares_outstanding
+
+def calculate_dcf(cashflow_statement, shares_outstanding, discount_rate=0.085, perpetual_growth_rate=0.025, projection_years=5):
+    """
+    Performs a simplified 2-stage Discounted Cash Flow (DCF) analysis
+    from an already fetched cash flow statement.
+    """
     if 'Free Cash Flow' in cashflow_statement.index:
         # Use Yahoo Finance's FCF if available
         fcf_history = cashflow_statement.loc['Free Cash Flow'].dropna()
@@ -86,43 +219,26 @@ def calculate_dcf(stock, discount_rate=0.085, perpetual_growth_rate=0.025, proje
     if fcf_history.empty or fcf_history.iloc[0] <= 0:
         return 0, "Not applicable (Negative or no FCF)"
 
-    # Simple growth rate: average of historical growth rates
-    fcf_growth_rates = fcf_history.pct_change().dropna()
-    if not fcf_growth_rates.empty:
+    # Growth rate: geometric mean of historical growth, from the mean log-return of the
+    # positive FCF values (statements list the most recent year first)
+    fcf_values = fcf_history.to_numpy(dtype=np.float64)[::-1]
+    fcf_values = fcf_values[fcf_values > 0]
+    if fcf_values.size >= 2:
         # Cap growth rate at a reasonable level (e.g., 15%) to avoid extreme projections
-        growth_rate = min(fcf_growth_rates.mean(), 0.15)
+        growth_rate = min(float(np.expm1(np.diff(np.log(fcf_values)).mean())), 0.15)
     else:
         growth_rate = 0.05 # Default growth rate if no history
 
     if growth_rate <= 0:
         growth_rate = 0.05 # Ensure growth rate is positive
 
-    # Project future FCF
-    last_fcf = fcf_history.iloc[0]
-    future_fcf = []
-    for i in range(1, projection_years + 1):
-        future_fcf.append(last_fcf * (1 + growth_rate)**i)
-
-    # Discount future FCF to present value
-    discounted_fcf = []
-    for i, fcf in enumerate(future_fcf):
-        discounted_fcf.append(fcf / (1 + discount_rate)**(i + 1))
-
-    # Calculate terminal value
-    terminal_value = (future_fcf[-1] * (1 + perpetual_growth_rate)) / (discount_rate - perpetual_growth_rate)
-
-    # Discount terminal value to present value
-    discounted_terminal_value = terminal_value / (1 + discount_rate)**projection_years
-
-    # Calculate total intrinsic value
-    total_intrinsic_value = sum(discounted_fcf) + discounted_terminal_value
-
-    # Get shares outstanding
-    shares_outstanding = stock.info.get('sharesOutstanding', 0)
-    if shares_outstanding == 0:
+    if not shares_outstanding:
         return 0, "Shares outstanding not available"
 
-    intrinsic_value_per_share = total_intrinsic_value / shares_outstanding
+    intrinsic_value_per_share = float(dcf_value_per_share(
+        fcf_history.iloc[0], growth_rate, discount_rate, perpetual_growth_rate,
+        projection_years, shares_outstanding
+    ))
 
     details = (f"FCF Growth (Stage 1): {growth_rate:.2%}\n"
                f"Discount Rate: {discount_rate:.2%}\n"
@@ -131,6 +247,9 @@ def calculate_dcf(stock, discount_rate=0.085, perpetual_growth_rate=0.025, proje
     return intrinsic_value_per_share, details
 
 
+# How far the intrinsic value may sit from the price (as a fraction of it) and still count as Fairly Valued
+FAIR_VALUE_BAND = 0.20
+
 def get_fundamental_status(intrinsic_value, current_price):
     """
     Determines if a stock is Undervalued, Overvalued, or Fairly Valued.
@@ -139,23 +258,120 @@ def get_fundamental_status(intrinsic_value, current_price):
         return "N/A"
 
     diff = (intrinsic_value - current_price) / current_price
-    if diff > 0.20:
+    if diff > FAIR_VALUE_BAND:
         return "Undervalued"
-    elif diff < -0.20:
+    elif diff < -FAIR_VALUE_BAND:
         return "Overvalued"
     else:
         return "Fairly Valued"
 
+def get_fundamental_statuses(intrinsic_values, current_prices):
+    """
+    Vectorized get_fundamental_status for arrays (or Series) of intrinsic values and prices.
+    """
+    intrinsic_values = np.asarray(intrinsic_values, dtype=np.float64)
+    current_prices = np.asarray(current_prices, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diff = (intrinsic_values - current_prices) / current_prices
+    return np.select(
+        [(intrinsic_values == 0) | (current_prices == 0), diff > FAIR_VALUE_BAND, diff < -FAIR_VALUE_BAND],
+        ["N/A", "Undervalued", "Overvalued"],
+        default="Fairly Valued"
+    )
+
+def get_all_fundamental_data(tickers, max_workers=8, retries=3):
+    """
+    Fetches fundamental data for several tickers concurrently.
+    Returns a dict mapping each ticker to its Fundamentals; tickers that failed are left out.
+    """
+    def _fetch_one(ticker):
+        for attempt in range(retries):
+            try:
+                return get_fundamental_data(ticker)
+            except Exception as e:
+                # Back off exponentially on rate limits and dropped connections; any other
+                # failure won't go away on retry, and must not fail the rest of the batch
+                if not _is_retryable(e) or attempt == retries - 1:
+                    warnings.warn(f"Failed to fetch data for {ticker}: {e}")
+                    return None
+                time.sleep(2 ** attempt)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(_fetch_one, tickers)
+        return {ticker: fundamentals for ticker, fundamentals in zip(tickers, results) if fundamentals is not None}
+
 def get_price_history(ticker):
     """
     Fetches historical price data for a given stock ticker.
     """
     stock = yf.Ticker(ticker)
-    hist = stock.history(period="1y")
+    hist = stock.history(period="1y", timeout=REQUEST_TIMEOUT)
     return hist
 
+def get_price_histories(tickers):
+    """
+    Fetches historical price data for several tickers with a single batched download.
+    Returns a dict mapping each ticker to its price history; tickers that failed are left out.
+    """
+    data = yf.download(
+        list(tickers), period="1y", group_by='ticker', threads=True, progress=False,
+        timeout=REQUEST_TIMEOUT
+    )
+    downloaded = set(data.columns.get_level_values(0))
+    price_histories = {}
+    for ticker in tickers:
+        if ticker not in downloaded:
+            continue
+        # Failed symbols still get (all-NaN) columns in the download
+        hist = data[ticker].dropna(how='all')
+        if not hist.empty:
+            price_histories[ticker] = hist
+    return price_histories
+
 # --- Sentiment Analysis ---
 
+# Finds the classification even when Gemini wraps it in punctuation or extra words
+_SENTIMENT_RE = re.compile(r'\b(positive|neutral|negative)\b', re.IGNORECASE)
+
+def _parse_sentiment(text):
+    """
+    Extracts 'Positive', 'Neutral', or 'Negative' from a Gemini reply, defaulting to 'Neutral'.
+    """
+    match = _SENTIMENT_RE.search(text)
+    if match:
+        return match.group(1).capitalize()
+    else:
+        return "Neutral" # Default if the response is not as expected
+
+@functools.cache
+def _get_model(api_key):
+    """
+    Configures the Gemini client once per API key and returns the shared model.
+    """
+    # Imported here because the Gemini SDK (grpc, protobuf) is slow to import and
+    # only needed once sentiment analysis actually runs
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-2.5-pro')
+
+@functools.lru_cache(maxsize=256)
+def _classify_sentiment(ticker, day, api_key):
+    """
+    Asks Gemini for the sentiment of a ticker. The day argument only serves to expire the cache daily.
+    """
+    prompt = f"""
+    Analyze the current sentiment for the stock with ticker {ticker} based on recent news and market chatter.
+    Classify the sentiment as one of the following three options:
+    - Positive
+    - Neutral
+    - Negative
+
+    Return only the single word classification.
+    """
+    response = _get_model(api_key).generate_content(prompt)
+    return _parse_sentiment(response.text)
+
 def get_sentiment_analysis(ticker):
     """
     Performs sentiment analysis and returns 'Positive', 'Neutral', or 'Negative'.
@@ -165,52 +381,51 @@ def get_sentiment_analysis(ticker):
         if not api_key:
             return "API Key Missing"
 
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-pro')
-
-        prompt = f"""
-        Analyze the current sentiment for the stock with ticker {ticker} based on recent news and market chatter.
-        Classify the sentiment as one of the following three options:
-        - Positive
-        - Neutral
-        - Negative
-
-        Return only the single word classification.
-        """
-        response = model.generate_content(prompt)
-        # Clean up the response to get one of the three expected words
-        sentiment = response.text.strip().capitalize()
-        if sentiment in ["Positive", "Neutral", "Negative"]:
-            return sentiment
-        else:
-            return "Neutral" # Default if the response is not as expected
+        return _classify_sentiment(ticker, date.today(), api_key)
     except Exception as e:
         return "API Error"
 
 # --- Final Recommendation Logic ---
 
+# (fundamental status, sentiment) -> recommendation
+RECOMMENDATIONS = {
+    ("Undervalued", "Positive"): "STRONG BUY",
+    ("Undervalued", "Neutral"): "BUY",
+    ("Undervalued", "Negative"): "HOLD",
+    ("Fairly Valued", "Positive"): "HOLD",
+    ("Fairly Valued", "Neutral"): "HOLD",
+    ("Fairly Valued", "Negative"): "HOLD",
+    ("Overvalued", "Positive"): "HOLD",
+    ("Overvalued", "Neutral"): "SELL",
+    ("Overvalued", "Negative"): "STRONG SELL",
+}
+
+# Used when the sentiment is not one of the three classifications (e.g. "API Error")
+DEFAULT_RECOMMENDATIONS = {
+    "Undervalued": "HOLD",
+    "Fairly Valued": "HOLD",
+    "Overvalued": "STRONG SELL",
+}
+
 def get_final_recommendation(fundamental_status, sentiment_status):
     """
     Generates a final recommendation based on fundamental and sentiment analysis.
     """
-    if fundamental_status == "Undervalued":
-        if sentiment_status == "Positive":
-            return "STRONG BUY"
-        elif sentiment_status == "Neutral":
-            return "BUY"
-        else: # Negative
-            return "HOLD"
-    elif fundamental_status == "Fairly Valued":
-        return "HOLD"
-    elif fundamental_status == "Overvalued":
-        if sentiment_status == "Positive":
-            return "HOLD"
-        elif sentiment_status == "Neutral":
-            return "SELL"
-        else: # Negative
-            return "STRONG SELL"
-    else:
-        return "N/A"
+    return RECOMMENDATIONS.get(
+        (fundamental_status, sentiment_status),
+        DEFAULT_RECOMMENDATIONS.get(fundamental_status, "N/A")
+    )
+
+def get_recommendations_vectorized(fundamental_statuses, sentiment_statuses):
+    """
+    Vectorized get_final_recommendation for arrays (or Series) of fundamental and sentiment statuses.
+    """
+    fundamental_statuses = pd.Series(np.asarray(fundamental_statuses, dtype=object))
+    sentiment_statuses = np.asarray(sentiment_statuses, dtype=object)
+    keys = pd.MultiIndex.from_arrays([fundamental_statuses, sentiment_statuses])
+    recommendations = pd.Series(RECOMMENDATIONS).reindex(keys).to_numpy()
+    defaults = fundamental_statuses.map(DEFAULT_RECOMMENDATIONS).fillna("N/A").to_numpy()
+    return np.where(pd.isna(recommendations), defaults, recommendations)
 
 if __name__ == '__main__':
     # Example usage:
@@ -221,14 +436,13 @@ if __name__ == '__main__':
     # print(f"--- Analysis for {test_ticker} ---")
 
     # fundamentals = get_fundamental_data(test_ticker)
-    # for key, value in fundamentals.items():
-    #     print(f"{key}: {value}")
+    # print(fundamentals)
 
     # print("\n--- Sentiment Analysis ---")
     # sentiment = get_sentiment_analysis(test_ticker)
     # print(f"Sentiment: {sentiment}")
 
     # print("\n--- Final Recommendation ---")
-    # recommendation = get_final_recommendation(fundamentals['Fundamental Status'], sentiment)
+    # recommendation = get_final_recommendation(fundamentals.fundamental_status, sentiment)
     # print(f"Recommendation: {recommendation}")
     pass
@@ -0,0 +1,84 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+
+_MISSING = object()
+
+def is_empty(value):
+    """
+    True for empty results, e.g. the empty DataFrame or dict yfinance returns when a request fails.
+    """
+    if value is None:
+        return True
+    empty = getattr(value, "empty", None)
+    if isinstance(empty, bool):
+        return empty
+    if isinstance(value, (dict, list, tuple)):
+        return len(value) == 0
+    return False
+
+def make_key(ticker, endpoint):
+    """
+    Builds a cache key of the form 'TICKER:endpoint'.
+    """
+    return f"{ticker}:{endpoint}"
+
+class FileCache:
+    """
+    A simple on-disk cache with a per-entry time-to-live, stored as pickle files.
+    Empty results are kept for a shorter empty_ttl_seconds, so a transient failure is
+    retried soon while a legitimately empty result isn't refetched on every call.
+    """
+
+    def __init__(self, cache_dir=".cache", ttl_seconds=24 * 3600, empty_ttl_seconds=3600):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.empty_ttl_seconds = empty_ttl_seconds
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.md5(key.encode()).hexdigest() + ".pkl")
+
+    def get(self, key, default=None, ttl_seconds=None):
+        """
+        Returns the cached value for key, or default if it is missing, expired or unreadable.
+        """
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > ttl:
+                return default
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            # Unreadable entries (e.g. pickled by an older pandas) count as a miss
+            return default
+
+    def set(self, key, value):
+        """
+        Stores value under key. Writes go through a temp file so readers never see a partial entry.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def get_or_compute(self, key, compute, ttl_seconds=None):
+        """
+        Returns the cached value for key, calling compute() and storing its result on a miss.
+        """
+        # Empty results live under their own key so they can expire on the shorter TTL
+        empty_key = key + ":empty"
+        value = self.get(key, _MISSING, ttl_seconds)
+        if value is _MISSING:
+            value = self.get(empty_key, _MISSING, self.empty_ttl_seconds)
+        if value is _MISSING:
+            value = compute()
+            self.set(empty_key if is_empty(value) else key, value)
+        return value
@@ -1,14 +1,100 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import time
+from concurrent.futures import ThreadPoolExecutor
 from analysis import (
     TECH_STOCKS,
+    SORTED_TECH_STOCKS,
     get_fundamental_data,
+    get_all_fundamental_data,
     get_sentiment_analysis,
     get_final_recommendation,
-    get_price_history
+    get_price_history,
+    get_price_histories
 )
 
+# Seconds before in-memory results are considered stale and fetched again
+CACHE_TTL = 900
+
+# Streamlit re-runs the script on every interaction, keep recent results in memory
+cached_fundamental_data = st.cache_data(ttl=CACHE_TTL, show_spinner=False)(get_fundamental_data)
+# Shared by every session of the server process, so the background preload only fetches once per TTL
+cached_all_fundamental_data = st.cache_data(ttl=CACHE_TTL, show_spinner=False)(get_all_fundamental_data)
+cached_price_history = st.cache_data(ttl=CACHE_TTL, show_spinner=False)(get_price_history)
+cached_price_histories = st.cache_data(ttl=CACHE_TTL, show_spinner=False)(get_price_histories)
+
+# Background workers that fetch data for every listed stock before the user asks for it
+_prefetch_pool = ThreadPoolExecutor(max_workers=2)
+
+def _prefetch(key, fetch, tickers):
+    """
+    Starts fetch(tickers) in the background and keeps its future in st.session_state[key].
+    The fetch is repeated once the previous one is older than CACHE_TTL.
+    """
+    submitted_at = st.session_state.get(f'{key}_submitted_at')
+    if submitted_at is None or time.time() - submitted_at > CACHE_TTL:
+        st.session_state[key] = _prefetch_pool.submit(fetch, tickers)
+        st.session_state[f'{key}_submitted_at'] = time.time()
+
+def _prefetched(key):
+    """
+    Returns the result of a finished prefetch, or an empty dict while it is still running or if it failed.
+    """
+    future = st.session_state.get(key)
+    if future is not None and future.done():
+        try:
+            return future.result()
+        except Exception:
+            pass
+    return {}
+
+def prefetch_price_histories(tickers):
+    """
+    Starts a batched download of the price history of every ticker in the background,
+    so switching stocks in the sidebar doesn't wait on Yahoo Finance.
+    """
+    _prefetch('price_hist', cached_price_histories, tickers)
+
+def prefetch_fundamental_data(tickers):
+    """
+    Starts fetching the fundamentals of every ticker in the background,
+    so switching stocks in the sidebar doesn't wait on Yahoo Finance.
+    """
+    _prefetch('fundamentals', cached_all_fundamental_data, tickers)
+
+def get_prefetched_price_history(ticker):
+    """
+    Returns the prefetched price history for a ticker. Falls back to fetching it on its own
+    if it wasn't prefetched or the batched download is still running.
+    """
+    price_history = _prefetched('price_hist').get(ticker)
+    if price_history is None:
+        price_history = cached_price_history(ticker)
+    return price_history
+
+def get_prefetched_fundamental_data(ticker):
+    """
+    Returns the prefetched fundamentals for a ticker. Falls back to fetching them on their own
+    if they weren't prefetched or the background fetch is still running.
+    """
+    fundamental_data = _prefetched('fundamentals').get(ticker)
+    if fundamental_data is None:
+        fundamental_data = cached_fundamental_data(ticker)
+    return fundamental_data
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=len(TECH_STOCKS), show_spinner=False)
+def build_price_chart(ticker, last_date, _price_history):
+    """
+    Builds the price history chart. Only the ticker and the date of the latest
+    close are hashed, so the figure is rebuilt only when new data arrives.
+    """
+    import plotly.graph_objects as go  # Deferred so reruns that don't draw the chart skip the import
+
+    # A bare WebGL trace skips Plotly Express's figure pipeline and renders long histories quickly
+    fig_price = go.Figure(go.Scattergl(x=_price_history.index, y=_price_history['Close'].to_numpy(), mode='lines'))
+    fig_price.update_layout(title=f"{ticker} Daily Close Price", yaxis_title="Price (USD)")
+    return fig_price
+
 def display_ui():
     """
     The main function to display the Streamlit UI for the stock analysis tool.
@@ -19,8 +105,10 @@ def display_ui():
     st.sidebar.title("Stock Selection")
     ticker = st.sidebar.selectbox(
         "Select a stock to analyze:",
-        options=sorted(TECH_STOCKS)
+        options=SORTED_TECH_STOCKS
     )
+    prefetch_price_histories(TECH_STOCKS)
+    prefetch_fundamental_data(TECH_STOCKS)
 
     if ticker:
         # --- Main Analysis Section ---
@@ -28,14 +116,17 @@ def display_ui():
 
         # Perform all analysis
         with st.spinner(f"Running full analysis for {ticker}..."):
-            fundamental_data = get_fundamental_data(ticker)
-            sentiment_status = get_sentiment_analysis(ticker)
+            # Sentiment is fetched on a thread of this rerun while the fundamentals are computed
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                sentiment_future = executor.submit(get_sentiment_analysis, ticker)
+                fundamental_data = get_prefetched_fundamental_data(ticker)
+                sentiment_status = sentiment_future.result()
             final_recommendation = get_final_recommendation(
-                fundamental_data['Fundamental Status'],
+                fundamental_data.fundamental_status,
                 sentiment_status
             )
 
-        st.header(f"{fundamental_data['Company Name']}")
+        st.header(f"{fundamental_data.company_name}")
 
         # --- Display the Final Recommendation ---
         st.subheader("Final Recommendation")
@@ -50,7 +141,7 @@ def display_ui():
 
         col1, col2 = st.columns(2)
         with col1:
-            st.metric(label="Fundamental Status", value=fundamental_data['Fundamental Status'])
+            st.metric(label="Fundamental Status", value=fundamental_data.fundamental_status)
         with col2:
             st.metric(label="Sentiment Status", value=sentiment_status)
 
@@ -61,26 +152,26 @@ def display_ui():
 
         with col1:
             st.subheader("Fundamental Analysis")
-            st.metric("Current Price", f"${fundamental_data['Current Price']:.2f}")
-            st.metric("Intrinsic Value (DCF)", f"${fundamental_data['Intrinsic Value (DCF)']:.2f}" if isinstance(fundamental_data['Intrinsic Value (DCF)'], float) else fundamental_data['Intrinsic Value (DCF)'])
+            st.metric("Current Price", f"${fundamental_data.current_price:.2f}")
+            st.metric("Intrinsic Value (DCF)", f"${fundamental_data.intrinsic_value:.2f}" if isinstance(fundamental_data.intrinsic_value, float) else fundamental_data.intrinsic_value)
 
             with st.expander("DCF Model Assumptions"):
-                st.text(fundamental_data['DCF Details'])
+                st.text(fundamental_data.dcf_details)
 
             st.subheader("Key Metrics")
-            st.text(f"Market Cap: {fundamental_data['Market Cap'] / 1e9:.2f}B")
-            st.text(f"P/E Ratio: {fundamental_data['P/E Ratio']:.2f}" if fundamental_data['P/E Ratio'] else "N/A")
-            st.text(f"P/B Ratio: {fundamental_data['P/B Ratio']:.2f}" if fundamental_data['P/B Ratio'] else "N/A")
-            st.text(f"Debt-to-Equity: {fundamental_data['Debt-to-Equity']:.2f}")
-            st.text(f"Current Ratio: {fundamental_data['Current Ratio']:.2f}")
-            st.text(f"Return on Equity (ROE): {fundamental_data['Return on Equity']:.2%}")
-            st.text(f"Free Cash Flow (TTM): {fundamental_data['Free Cash Flow'] / 1e9:.2f}B")
+            st.text(f"Market Cap: {fundamental_data.market_cap / 1e9:.2f}B")
+            st.text(f"P/E Ratio: {fundamental_data.pe_ratio:.2f}" if fundamental_data.pe_ratio else "N/A")
+            st.text(f"P/B Ratio: {fundamental_data.pb_ratio:.2f}" if fundamental_data.pb_ratio else "N/A")
+            st.text(f"Debt-to-Equity: {fundamental_data.debt_to_equity:.2f}")
+            st.text(f"Current Ratio: {fundamental_data.current_ratio:.2f}")
+            st.text(f"Return on Equity (ROE): {fundamental_data.return_on_equity:.2%}")
+            st.text(f"Free Cash Flow (TTM): {fundamental_data.free_cash_flow / 1e9:.2f}B")
 
         with col2:
             st.subheader("Price History (Last 1 Year)")
-            price_history = get_price_history(ticker)
-            fig_price = px.line(price_history, x=price_history.index, y='Close')
-            fig_price.update_layout(title=f"{ticker} Daily Close Price", yaxis_title="Price (USD)")
+            price_history = get_prefetched_price_history(ticker)
+            last_date = price_history.index[-1] if not price_history.empty else None
+            fig_price = build_price_chart(ticker, last_date, price_history)
             st.plotly_chart(fig_price, use_container_width=True)
 
         # --- Disclaimer ---